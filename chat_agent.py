@@ -1,8 +1,14 @@
-import google.generativeai as genai
+import functools
+import hashlib
 import os
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
 # Load environment variables
 load_dotenv()
 
@@ -11,28 +17,130 @@ api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
     raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-genai.configure(api_key=api_key)
+CHAT_ERROR_MESSAGE = "I apologize, but I encountered an error while processing your request. Please try again."
+
+# Caps concurrent Gemini chat requests across all Streamlit sessions
+_GEMINI_SEMAPHORE = threading.BoundedSemaphore(int(os.getenv("GEMINI_CONCURRENCY", "4")))
+
+# Recent chat replies keyed by a hash of the full prompt (profile context + message)
+_RESPONSE_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_RESPONSE_CACHE_MAX = 256
+_RESPONSE_CACHE_LOCK = threading.Lock()
 
-def get_chat_response(profile: Dict, user_message: str) -> str:
+def _get_cached_response(prompt_key: str) -> Optional[str]:
     """
-    Generate a response based on the person's profile and user message.
+    Look up a cached chat reply, marking it as recently used.
     
     Args:
-        profile (Dict): Person's profile data
-        user_message (str): User's message
+        prompt_key (str): Hash of the prompt
         
     Returns:
-        str: AI's response
+        Optional[str]: Cached reply, or None on a miss
     """
-    try:
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.0-flash')
+    with _RESPONSE_CACHE_LOCK:
+        if prompt_key not in _RESPONSE_CACHE:
+            return None
+        _RESPONSE_CACHE.move_to_end(prompt_key)
+        return _RESPONSE_CACHE[prompt_key]
+
+def _cache_response(prompt_key: str, response_text: str) -> None:
+    """
+    Store a chat reply, evicting the least recently used one when full.
+    
+    Args:
+        prompt_key (str): Hash of the prompt
+        response_text (str): Reply to cache
+    """
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[prompt_key] = response_text
+        if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX:
+            _RESPONSE_CACHE.popitem(last=False)
+
+def _lookup_response(prompt: str, history: Optional[List[Dict]]) -> Tuple[str, Optional[str]]:
+    """
+    Compute the response cache key for a chat turn and look it up.
+    
+    The conversation so far is part of the key, so a question repeated later
+    in a chat ("give me another tip") goes to Gemini again instead of replaying
+    the first answer. Only the same question at the same point of a
+    conversation, e.g. the opening question of a new session, is served from
+    the cache.
+    
+    Args:
+        prompt (str): Prompt built for the current message
+        history (Optional[List[Dict]]): Earlier messages with "role" and "content"
         
-        # Prepare context from profile
-        context = prepare_profile_context(profile)
+    Returns:
+        Tuple[str, Optional[str]]: Cache key, and the cached reply or None on a miss
+    """
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16)
+    for message in history or []:
+        digest.update(f"\0{message['role']}\0{message['content']}".encode("utf-8"))
+    prompt_key = digest.hexdigest()
+    return prompt_key, _get_cached_response(prompt_key)
+
+# Prepared profile contexts keyed by (person id, updated_at)
+_CONTEXT_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_CONTEXT_CACHE_MAX = 128
+_CONTEXT_CACHE_LOCK = threading.Lock()
+
+def _get_profile_context(profile: Dict) -> str:
+    """
+    Get the LLM context for a profile, rebuilding it only when the profile is re-saved.
+    
+    Args:
+        profile (Dict): Person's profile data
+        
+    Returns:
+        str: Formatted context string
+    """
+    version = profile.get("updated_at")
+    if version is None:
+        # Profiles saved before versioning have nothing safe to key on
+        return prepare_profile_context(profile)
+    
+    key = (profile['person']['id'], version)
+    with _CONTEXT_CACHE_LOCK:
+        if key in _CONTEXT_CACHE:
+            _CONTEXT_CACHE.move_to_end(key)
+            return _CONTEXT_CACHE[key]
+    
+    context = prepare_profile_context(profile)
+    with _CONTEXT_CACHE_LOCK:
+        _CONTEXT_CACHE[key] = context
+        if len(_CONTEXT_CACHE) > _CONTEXT_CACHE_MAX:
+            _CONTEXT_CACHE.popitem(last=False)
+    return context
+
+@functools.lru_cache(maxsize=1)
+def _get_model() -> "genai.GenerativeModel":
+    """
+    Get the Gemini model used for chat, created once and reused.
+    
+    Returns:
+        genai.GenerativeModel: Shared Gemini model
+    """
+    # The SDK is only needed once the first chat message is sent
+    import google.generativeai as genai
+    
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+def build_chat_prompt(profile: Dict, user_message: str) -> str:
+    """
+    Build the Gemini prompt for a chat message about a person.
+    
+    Args:
+        profile (Dict): Person's profile data
+        user_message (str): User's message
         
-        # Generate response
-        prompt = f"""
+    Returns:
+        str: Prompt text
+    """
+    # Prepare context from profile
+    context = _get_profile_context(profile)
+    
+    return f"""
         You are an AI assistant helping someone communicate with {profile['person']['full_name']}.
         Use the following profile information to provide personalized advice and responses:
         
@@ -48,14 +156,61 @@ def get_chat_response(profile: Dict, user_message: str) -> str:
         
         Format your response in a conversational way, as if you're giving advice to a friend.
         """
+
+def get_chat_response(profile: Dict, user_message: str, history: Optional[List[Dict]] = None) -> str:
+    """
+    Generate a response based on the person's profile and user message.
+    
+    Args:
+        profile (Dict): Person's profile data
+        user_message (str): User's message
+        history (Optional[List[Dict]]): Earlier chat messages, used for response caching
+        
+    Returns:
+        str: AI's response
+    """
+    return "".join(stream_chat_response(profile, user_message, history))
+
+def stream_chat_response(profile: Dict, user_message: str, history: Optional[List[Dict]] = None) -> Iterator[str]:
+    """
+    Stream a response based on the person's profile and user message.
+    
+    Args:
+        profile (Dict): Person's profile data
+        user_message (str): User's message
+        history (Optional[List[Dict]]): Earlier chat messages, used for response caching
+        
+    Yields:
+        str: Chunks of the AI's response as they are generated
+    """
+    try:
+        prompt = build_chat_prompt(profile, user_message)
+        
+        # The same question at the same point of a chat about an unchanged
+        # profile reuses the earlier reply
+        prompt_key, cached = _lookup_response(prompt, history)
+        if cached is not None:
+            yield cached
+            return
+        
+        # Get the shared Gemini model
+        model = _get_model()
+        
+        # Only opening the request holds a slot: Streamlit can abandon this
+        # generator mid-stream, and a slot held across yield would leak with it
+        with _GEMINI_SEMAPHORE:
+            response = model.generate_content(prompt, stream=True)
         
-        # Generate response
-        response = model.generate_content(prompt)
-        return response.text
+        # Yield text as soon as each chunk arrives
+        chunks = []
+        for chunk in response:
+            chunks.append(chunk.text)
+            yield chunk.text
+        _cache_response(prompt_key, "".join(chunks))
         
     except Exception as e:
         print(f"Error generating chat response: {str(e)}")
-        return f"I apologize, but I encountered an error while processing your request. Please try again."
+        yield CHAT_ERROR_MESSAGE
 
 def prepare_profile_context(profile: Dict) -> str:
     """
@@ -1,10 +1,21 @@
-import google.generativeai as genai
 import os
-from typing import Dict, List
-import json
+from typing import TYPE_CHECKING, Dict, List, Optional
+import copy
+import functools
+import hashlib
+import orjson
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -24,7 +35,182 @@ if not api_key:
 if not api_key:
     raise ValueError("GOOGLE_API_KEY not found in environment variables or .env file")
 
-genai.configure(api_key=api_key)
+# Characters that matter when scanning for a balanced JSON object
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+def _find_closing_brace(text: str, start: int) -> Optional[int]:
+    """
+    Find the brace that closes the object opened at text[start].
+    
+    Braces inside JSON strings (including escaped quotes) are ignored.
+    
+    Args:
+        text (str): Text containing the object
+        start (int): Index of the opening brace
+        
+    Returns:
+        Optional[int]: Index of the closing brace, or None if it is never closed
+    """
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = match.group()
+        
+        if in_string:
+            if char == "\\":
+                escaped_pos = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+    
+    return None
+
+def _extract_json_object(text: str) -> Optional[Dict]:
+    """
+    Find the first JSON object embedded in a chatty LLM reply.
+    
+    Every "{" is tried in turn as the start of an object, and a candidate is
+    only accepted if it parses. Braces in the surrounding prose, e.g. "{the}"
+    or a quoted "{", are therefore skipped rather than ending the search.
+    The search stops at an object that is never closed (e.g. a reply cut off
+    at the token limit), so a nested object is not mistaken for the reply.
+    
+    Args:
+        text (str): Text that may contain a JSON object
+        
+    Returns:
+        Optional[Dict]: The parsed object, or None if the text contains none
+    """
+    start = text.find("{")
+    while start != -1:
+        end = _find_closing_brace(text, start)
+        if end is None:
+            # Every later "{" lies inside this unclosed object
+            break
+        try:
+            value = orjson.loads(text[start:end + 1])
+        except orjson.JSONDecodeError:
+            value = None
+        if isinstance(value, dict):
+            return value
+        start = text.find("{", start + 1)
+    
+    return None
+
+# Gemini model used to generate and update profiles
+PROFILE_MODEL = 'gemini-2.0-flash'
+
+# JSON mode: Gemini returns a bare JSON document, with no Markdown fences or prose
+_JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+@functools.lru_cache(maxsize=4)
+def _get_model(model_name: str = PROFILE_MODEL) -> "genai.GenerativeModel":
+    """
+    Get a Gemini model by name, created once and reused.
+    
+    Args:
+        model_name (str): Gemini model name
+        
+    Returns:
+        genai.GenerativeModel: Shared Gemini model
+    """
+    # Deferred until a profile is generated or updated
+    import google.generativeai as genai
+    
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Longest search snippet passed to the LLM; longer ones are cut at a word boundary
+_SNIPPET_MAX_CHARS = 300
+
+# Generated profiles keyed by a hash of the model and context they were built from
+_GENERATED_PROFILES: "OrderedDict[str, Dict]" = OrderedDict()
+_GENERATED_PROFILES_MAX = 128
+_GENERATED_PROFILES_LOCK = threading.Lock()
+
+# Fields every generated profile must have; the UI reads them directly
+_PROFILE_FIELDS = ("introduction", "interests", "communication_style", "communication_tips")
+
+# Audio insight fields holding raw text that is too bulky for the profile
+_TRANSCRIPT_FIELDS = ("original_transcription", "english_transcription", "raw_response")
+
+def _load_profile_file(filepath: str) -> Dict:
+    """
+    Load a profile JSON file.
+    
+    Args:
+        filepath (str): Path to the profile file
+        
+    Returns:
+        Dict: Profile data
+    """
+    return orjson.loads(Path(filepath).read_bytes())
+
+# Profile reads are spread over a thread pool once there are this many files
+_PARALLEL_READ_MIN = 8
+_READ_WORKERS = 8
+
+def _read_person(filepath: str) -> Optional[Dict]:
+    """
+    Read the person metadata of one profile file, reporting failures instead of raising.
+    
+    Args:
+        filepath (str): Path to the profile file
+        
+    Returns:
+        Optional[Dict]: The profile's "person" entry, or None if it is missing or unreadable
+    """
+    try:
+        return _load_profile_file(filepath).get("person")
+    except Exception as e:
+        print(f"Error reading profile {os.path.basename(filepath)}: {str(e)}")
+        return None
+
+def _profile_cache_key(model_name: str, context: str) -> str:
+    """
+    Hash the model name and normalized LLM context into a cache key.
+    
+    Only what is actually sent to the model is hashed, so searches that differ
+    in fields prepare_context drops, or only in whitespace, share an entry.
+    
+    Args:
+        model_name (str): Gemini model name
+        context (str): Context built by prepare_context
+        
+    Returns:
+        str: Hex digest identifying the generation request
+    """
+    normalized = _WHITESPACE_RE.sub(" ", context).strip()
+    payload = f"{model_name}\n{normalized}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def _set_profile_metadata(profile_data: Dict, search_results: Dict) -> None:
+    """
+    Stamp a generated profile with the time and the search it was built for.
+    
+    Args:
+        profile_data (Dict): Generated profile data (modified in place)
+        search_results (Dict): Search results from SerpAPI
+    """
+    profile_data["generated_at"] = datetime.now().isoformat()
+    profile_data["source_data"] = {
+        "search_timestamp": search_results.get("timestamp"),
+        "query": search_results.get("query")
+    }
 
 def generate_profile(search_results: Dict) -> Dict:
     """
@@ -37,12 +223,26 @@ def generate_profile(search_results: Dict) -> Dict:
         Dict: Generated profile information
     """
     try:
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
         # Prepare context from search results
         context = prepare_context(search_results)
         
+        # Reuse the profile if the same context was already analyzed
+        cache_key = _profile_cache_key(PROFILE_MODEL, context)
+        with _GENERATED_PROFILES_LOCK:
+            if cache_key in _GENERATED_PROFILES:
+                _GENERATED_PROFILES.move_to_end(cache_key)
+                profile_data = copy.deepcopy(_GENERATED_PROFILES[cache_key])
+            else:
+                profile_data = None
+        
+        if profile_data is not None:
+            # The analysis is reused, but provenance belongs to this search
+            _set_profile_metadata(profile_data, search_results)
+            return profile_data
+        
+        # Get the shared Gemini model
+        model = _get_model()
+        
         # Generate profile
         prompt = f"""
         Based on the following information about a person, generate a detailed profile.
@@ -64,26 +264,34 @@ def generate_profile(search_results: Dict) -> Dict:
         """
         
         # Generate response
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, generation_config=_JSON_GENERATION_CONFIG)
         
         # Parse response
         try:
-            profile_data = json.loads(response.text)
-        except json.JSONDecodeError:
+            profile_data = orjson.loads(response.text)
+        except orjson.JSONDecodeError:
             # If response is not valid JSON, try to extract JSON from the text
-            import re
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if json_match:
-                profile_data = json.loads(json_match.group())
-            else:
+            profile_data = _extract_json_object(response.text)
+            if profile_data is None:
                 raise ValueError("Could not parse response as JSON")
         
+        # JSON mode guarantees JSON, not an object
+        if not isinstance(profile_data, dict):
+            raise ValueError("Profile from AI response is not a JSON object")
+        
+        # Checked before caching, so an incomplete reply is retried rather than reused
+        missing = [field for field in _PROFILE_FIELDS if field not in profile_data]
+        if missing:
+            raise ValueError(f"Profile from AI response is missing fields: {', '.join(missing)}")
+        
         # Add metadata
-        profile_data["generated_at"] = datetime.now().isoformat()
-        profile_data["source_data"] = {
-            "search_timestamp": search_results.get("timestamp"),
-            "query": search_results.get("query")
-        }
+        _set_profile_metadata(profile_data, search_results)
+        
+        # Callers mutate the returned profile, so cache a private copy
+        with _GENERATED_PROFILES_LOCK:
+            _GENERATED_PROFILES[cache_key] = copy.deepcopy(profile_data)
+            if len(_GENERATED_PROFILES) > _GENERATED_PROFILES_MAX:
+                _GENERATED_PROFILES.popitem(last=False)
         
         return profile_data
         
@@ -102,6 +310,8 @@ def prepare_context(search_results: Dict) -> str:
         str: Formatted context string
     """
     context_parts = []
+    # Normalized text already in the context, so repeated snippets are sent once
+    seen = set()
     
     # Add knowledge graph information
     if knowledge_graph := search_results.get("knowledge_graph"):
@@ -109,13 +319,24 @@ def prepare_context(search_results: Dict) -> str:
         for key, value in knowledge_graph.items():
             if isinstance(value, (str, list)):
                 context_parts.append(f"{key}: {value}")
+                if isinstance(value, str):
+                    seen.add(_WHITESPACE_RE.sub(" ", value).strip().casefold())
     
     # Add organic results
     if organic_results := search_results.get("organic_results"):
         context_parts.append("\nSearch Results:")
         for result in organic_results[:5]:  # Limit to top 5 results
             context_parts.append(f"Title: {result.get('title', '')}")
-            context_parts.append(f"Snippet: {result.get('snippet', '')}")
+            
+            # Empty and repeated snippets are left out; the title and link stay
+            snippet = _WHITESPACE_RE.sub(" ", result.get('snippet') or '').strip()
+            snippet_key = snippet.casefold()
+            if snippet_key and snippet_key not in seen:
+                seen.add(snippet_key)
+                if len(snippet) > _SNIPPET_MAX_CHARS:
+                    snippet = snippet[:_SNIPPET_MAX_CHARS].rsplit(" ", 1)[0] + "..."
+                context_parts.append(f"Snippet: {snippet}")
+            
             context_parts.append(f"Link: {result.get('link', '')}\n")
     
     return "\n".join(context_parts)
@@ -151,36 +372,84 @@ def save_profile(first_name: str, last_name: str, profile_data: Dict) -> str:
         "full_name": f"{first_name} {last_name}"
     }
     
-    # Save to file
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(profile_data, f, ensure_ascii=False, indent=2)
+    # Version stamp so derived data (e.g. chat context) can be cached per save
+    profile_data["updated_at"] = datetime.now().isoformat()
+    
+    # Write to a temporary file and rename it over the profile, so readers
+    # never see a partially written file. Each save gets its own temporary
+    # file, so concurrent saves of the same person cannot interleave.
+    fd, tmp_filepath = tempfile.mkstemp(dir=people_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(profile_data, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filepath, filepath)
+    finally:
+        # Only left behind if the write or rename failed
+        if os.path.exists(tmp_filepath):
+            os.unlink(tmp_filepath)
     
     return filepath
 
-def get_all_profiles() -> List[Dict]:
+def get_profiles_version() -> str:
+    """
+    Get a cheap token that changes whenever a profile is added, removed or saved.
+    
+    Every profile file's name, mtime and size go into the token, so replacing
+    an older file or deleting one profile while adding another also changes it.
+    
+    Returns:
+        str: Hex digest of the (name, mtime_ns, size) of every profile file
+    """
+    people_dir = os.path.join("data", "people")
+    
+    files = []
+    try:
+        with os.scandir(people_dir) as it:
+            for entry in it:
+                if entry.name.endswith("_profile.json"):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except FileNotFoundError:
+        pass
+    
+    # scandir order is arbitrary; sort so the same files always give the same token
+    files.sort()
+    return hashlib.blake2b(repr(files).encode("utf-8"), digest_size=16).hexdigest()
+
+def get_profile_index() -> List[Dict]:
     """
-    Get a list of all saved profiles.
+    Get the person metadata of all saved profiles.
+    
+    main.py caches the result on get_profiles_version(), so the files are only
+    read again after a profile is added, removed or saved.
     
     Returns:
-        List[Dict]: List of profile data
+        List[Dict]: Person metadata ("id", "first_name", "last_name", "full_name") per profile
     """
-    profiles = []
+    people = []
     people_dir = os.path.join("data", "people")
     
-    if not os.path.exists(people_dir):
-        return profiles
+    try:
+        with os.scandir(people_dir) as it:
+            filepaths = [
+                entry.path
+                for entry in it
+                if entry.name.endswith("_profile.json") and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return people
     
-    for filename in os.listdir(people_dir):
-        if filename.endswith("_profile.json"):
-            filepath = os.path.join(people_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    profile_data = json.load(f)
-                    profiles.append(profile_data)
-            except Exception as e:
-                print(f"Error reading profile {filename}: {str(e)}")
+    # Overlap file reads across threads; not worth a pool for a handful of files
+    if len(filepaths) >= _PARALLEL_READ_MIN:
+        with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+            loaded = list(executor.map(_read_person, filepaths))
+    else:
+        loaded = [_read_person(filepath) for filepath in filepaths]
     
-    return profiles
+    people.extend(person for person in loaded if person)
+    return people
 
 def get_profile_by_id(person_id: str) -> Dict:
     """
@@ -194,14 +463,50 @@ def get_profile_by_id(person_id: str) -> Dict:
     """
     try:
         file_path = os.path.join("data", "people", f"{person_id}_profile.json")
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+        try:
+            return _load_profile_file(file_path)
+        except FileNotFoundError:
+            return {}
     except Exception as e:
         print(f"Error reading profile {person_id}: {str(e)}")
         return {}
 
+def _apply_profile_delta(profile: Dict, delta: Dict) -> Dict:
+    """
+    Apply the changes returned by the profile update prompt to a profile.
+    
+    Args:
+        profile (Dict): Existing profile data (modified in place)
+        delta (Dict): Changes with "add_*" lists and an optional "communication_style"
+        
+    Returns:
+        Dict: Updated profile data
+    """
+    for delta_field, field in (
+        ("add_interests", "interests"),
+        ("add_communication_tips", "communication_tips"),
+        ("add_key_points", "key_points")
+    ):
+        new_items = delta.get(delta_field)
+        if not isinstance(new_items, list):
+            continue
+        
+        items = profile.setdefault(field, [])
+        seen = {item.strip().casefold() for item in items if isinstance(item, str)}
+        for item in new_items:
+            if not isinstance(item, str):
+                continue
+            item = item.strip()
+            if item and item.casefold() not in seen:
+                items.append(item)
+                seen.add(item.casefold())
+    
+    communication_style = delta.get("communication_style")
+    if isinstance(communication_style, str) and communication_style.strip():
+        profile["communication_style"] = communication_style.strip()
+    
+    return profile
+
 def update_profile_with_audio(person_id: str, audio_insights: Dict) -> Dict:
     """
     Update existing profile with insights from audio analysis.
@@ -219,12 +524,26 @@ def update_profile_with_audio(person_id: str, audio_insights: Dict) -> Dict:
         if not profile:
             raise ValueError(f"Profile not found for person_id: {person_id}")
         
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        # Get the shared Gemini model
+        model = _get_model()
+        
+        # Full transcripts are stored with the transcription, not in the profile
+        insights_summary = {
+            key: value for key, value in audio_insights.items()
+            if key not in _TRANSCRIPT_FIELDS
+        }
+        
+        # Only the fields the update can touch are sent, not the whole profile
+        current_fields = {
+            "interests": profile.get("interests", []),
+            "communication_style": profile.get("communication_style", ""),
+            "communication_tips": profile.get("communication_tips", []),
+            "key_points": profile.get("key_points", [])
+        }
         
         # Prepare context for profile update
         context = f"""
-        You are a precise JSON generator. Your task is to update a person's profile with new insights.
+        You are a precise JSON generator. Your task is to describe how new insights change a person's profile.
         Follow these rules strictly:
         1. Output ONLY valid JSON
         2. Use double quotes for strings
@@ -233,55 +552,46 @@ def update_profile_with_audio(person_id: str, audio_insights: Dict) -> Dict:
         5. Ensure all arrays and objects are properly closed
         6. Do not include any comments or explanations
 
-        Current profile:
-        {json.dumps(profile, indent=2)}
+        Current profile fields:
+        {orjson.dumps(current_fields, option=orjson.OPT_INDENT_2).decode()}
         
         New audio insights:
-        {json.dumps(audio_insights, indent=2)}
-        
-        Update the profile by:
-        1. Adding new interests from audio_insights['new_interests']
-        2. Updating communication style based on audio_insights['communication_style']
-        3. Adding new key points to the profile
-        4. Incorporating any new information while maintaining existing data
+        {orjson.dumps(insights_summary, option=orjson.OPT_INDENT_2).decode()}
         
-        The output must be a valid JSON object with the exact same structure as the current profile.
-        Keep all existing fields and their types, only update their values with new information.
+        Return ONLY the changes as a JSON object with this exact structure:
+        {{
+            "add_interests": ["New interests from the insights that are not already listed"],
+            "communication_style": "Updated communication style description, or null to keep the current one",
+            "add_communication_tips": ["New tips for communicating with this person"],
+            "add_key_points": ["New key points about this person"]
+        }}
+        Use empty lists for fields with nothing new.
         """
         
-        # Generate updated profile
-        response = model.generate_content(context)
-        
-        # Clean the response text to ensure it's valid JSON
-        response_text = response.text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        # Generate the profile changes
+        response = model.generate_content(context, generation_config=_JSON_GENERATION_CONFIG)
+        response_text = response.text
         
         try:
-            updated_profile = json.loads(response_text)
-            
-            # Verify that the updated profile has all required fields
-            required_fields = ["person", "introduction", "interests", "communication_style", "communication_tips"]
-            for field in required_fields:
-                if field not in updated_profile:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # Save updated profile
-            save_profile(
-                updated_profile['person']['first_name'],
-                updated_profile['person']['last_name'],
-                updated_profile
-            )
-            
-            return updated_profile
-            
-        except json.JSONDecodeError as e:
+            delta = orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
             print(f"JSON parsing error: {str(e)}")
             print(f"Raw response: {response_text}")
-            raise ValueError("Failed to parse updated profile from AI response")
+            raise ValueError("Failed to parse profile update from AI response")
+        
+        if not isinstance(delta, dict):
+            raise ValueError("Profile update from AI response is not a JSON object")
+        
+        updated_profile = _apply_profile_delta(profile, delta)
+        
+        # Save updated profile
+        save_profile(
+            updated_profile['person']['first_name'],
+            updated_profile['person']['last_name'],
+            updated_profile
+        )
+        
+        return updated_profile
             
     except Exception as e:
         print(f"Error updating profile with audio insights: {str(e)}")
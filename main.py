@@ -2,15 +2,21 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from serpapi_handler import search_person, get_social_profiles
-from llm_profile import generate_profile, save_profile, get_all_profiles, get_profile_by_id, update_profile_with_audio
-from video_processor import process_audio, get_transcriptions
-from chat_agent import get_chat_response
+from llm_profile import generate_profile, save_profile, get_profile_index, get_profiles_version, get_profile_by_id, update_profile_with_audio
+from video_processor import process_audio, get_transcriptions, preload_whisper_model
+from chat_agent import stream_chat_response
 # TODO: Implement these modules
 # from speaker_identifier import identify_speaker
 
 # Load environment variables
 load_dotenv()
 
+# Maximum number of chat messages kept in the session
+MAX_CHAT_MESSAGES = 50
+
+# Load Whisper in the background so the first audio upload does not wait for it
+preload_whisper_model()
+
 # Page config
 st.set_page_config(
     page_title="PersonaAnalyst",
@@ -22,6 +28,18 @@ st.set_page_config(
 st.title("PersonaAnalyst 🔍")
 st.subheader("AI-powered Person Analysis Tool")
 
+@st.cache_data(ttl=60, max_entries=16, show_spinner=False)
+def cached_profile_index(profiles_version: str) -> tuple:
+    """
+    Person metadata of all saved profiles plus a full name -> id lookup,
+    reused across reruns.
+    
+    profiles_version only keys the cache: it changes whenever a profile file
+    is added, removed or saved, which forces a fresh read.
+    """
+    people = get_profile_index()
+    return people, {p['full_name']: p['id'] for p in people}
+
 # Initialize session state for selected profile
 if "selected_profile" not in st.session_state:
     st.session_state.selected_profile = None
@@ -36,17 +54,39 @@ page = st.sidebar.selectbox(
 st.sidebar.markdown("---")
 st.sidebar.subheader("Saved Profiles")
 
-# Get all saved profiles
-profiles = get_all_profiles()
-if profiles:
-    profile_names = [f"{p['person']['first_name']} {p['person']['last_name']}" for p in profiles]
-    selected_name = st.sidebar.selectbox("Select a profile", profile_names)
+# Load the saved people once per rerun from the profile index; the pages below
+# reuse the name -> id lookup and only load the full profile that is selected
+people, profile_ids = cached_profile_index(get_profiles_version())
+
+# Drawn again after a save, so a new profile is listed without rerunning the script
+saved_profiles_sidebar = st.sidebar.empty()
+
+def show_saved_profiles():
+    """Draw the saved profile selector into its sidebar placeholder."""
+    with saved_profiles_sidebar.container():
+        if people:
+            selected_name = st.selectbox("Select a profile", list(profile_ids))
+            
+            if selected_name:
+                st.session_state.selected_profile = get_profile_by_id(profile_ids[selected_name])
+        else:
+            st.info("No profiles saved yet. Create a profile in the Profile Analysis page.")
+
+show_saved_profiles()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_search_person(query_key: str, _first_name: str, _last_name: str) -> dict:
+    """
+    Search for a person, reusing successful results for an hour.
     
-    if selected_name:
-        selected_profile = next((p for p in profiles if f"{p['person']['first_name']} {p['person']['last_name']}" == selected_name), None)
-        st.session_state.selected_profile = selected_profile
-else:
-    st.sidebar.info("No profiles saved yet. Create a profile in the Profile Analysis page.")
+    Only query_key is hashed by Streamlit (underscore arguments are skipped),
+    so names differing in case or surrounding whitespace share one entry.
+    """
+    search_results = search_person(_first_name, _last_name)
+    if "error" in search_results:
+        # Raise so the failed lookup is not cached
+        raise RuntimeError(search_results["error"])
+    return search_results
 
 def main():
     if page == "Profile Analysis":
@@ -60,14 +100,18 @@ def show_profile_analysis():
     st.header("Profile Analysis")
     
     # Input fields
-    first_name = st.text_input("First Name")
-    last_name = st.text_input("Last Name")
+    first_name = st.text_input("First Name").strip()
+    last_name = st.text_input("Last Name").strip()
     
     if st.button("Analyze Profile"):
         if first_name and last_name:
             with st.spinner("Searching for information..."):
                 # Search for person
-                search_results = search_person(first_name, last_name)
+                try:
+                    query_key = f"{first_name} {last_name}".casefold()
+                    search_results = cached_search_person(query_key, first_name, last_name)
+                except RuntimeError as e:
+                    search_results = {"error": str(e)}
                 
                 if "error" in search_results:
                     st.error(f"Error during search: {search_results['error']}")
@@ -108,29 +152,32 @@ def show_profile_analysis():
                             filepath = save_profile(first_name, last_name, profile_data)
                             st.success(f"Profile saved successfully to {filepath}")
                             
-                            # Update the sidebar
-                            st.experimental_rerun()
+                            # List a new person in the sidebar from memory; the analysis above stays on screen
+                            person = profile_data["person"]
+                            if person["full_name"] not in profile_ids:
+                                people.append(person)
+                                profile_ids[person["full_name"]] = person["id"]
+                                show_saved_profiles()
         else:
             st.error("Please enter both first and last name")
 
 def show_audio_analysis():
     st.header("Audio Analysis")
     
-    # Get all profiles
-    profiles = get_all_profiles()
-    
-    if not profiles:
+    if not people:
         st.warning("No profiles available. Please generate a profile first.")
         return
     
     # Profile selection
-    profile_options = {f"{p['person']['full_name']}": p for p in profiles}
     selected_name = st.selectbox(
         "Select a person to analyze audio for",
-        options=list(profile_options.keys())
+        options=list(profile_ids)
     )
     
-    selected_profile = profile_options[selected_name]
+    selected_profile = get_profile_by_id(profile_ids[selected_name])
+    if not selected_profile:
+        st.error("Could not load the selected profile.")
+        return
     
     # Display current profile information
     with st.expander("Current Profile Information"):
@@ -212,21 +259,20 @@ def show_audio_analysis():
 def show_chat_assistant():
     st.header("Chat Assistant")
     
-    # Get all profiles
-    profiles = get_all_profiles()
-    
-    if not profiles:
+    if not people:
         st.warning("No profiles available. Please generate a profile first.")
         return
     
     # Profile selection
-    profile_options = {f"{p['person']['full_name']}": p for p in profiles}
     selected_name = st.selectbox(
         "Select a person to chat about",
-        options=list(profile_options.keys())
+        options=list(profile_ids)
     )
     
-    selected_profile = profile_options[selected_name]
+    selected_profile = get_profile_by_id(profile_ids[selected_name])
+    if not selected_profile:
+        st.error("Could not load the selected profile.")
+        return
     
     # Display profile summary
     with st.expander("View Profile Summary"):
@@ -259,9 +305,11 @@ def show_chat_assistant():
         
         # Get AI response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_chat_response(selected_profile, prompt)
-                st.write(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+            history = st.session_state.messages[:-1]
+            response = st.write_stream(stream_chat_response(selected_profile, prompt, history))
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            
+            # Drop the oldest messages so the session history stays bounded
+            del st.session_state.messages[:-MAX_CHAT_MESSAGES]
 
 main() 
\ No newline at end of file
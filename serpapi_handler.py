@@ -1,9 +1,33 @@
-from serpapi import GoogleSearch
+import requests
 import os
+import re
 from typing import Dict, List
-import json
+import orjson
 from datetime import datetime
 
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+# Shared session so repeated searches reuse the TLS connection to SerpAPI
+_SESSION = requests.Session()
+
+# The API key travels in the query string, and requests errors quote the URL
+_API_KEY_RE = re.compile(r'(api_key=)[^&\s]+')
+
+# Common social media domains
+SOCIAL_DOMAINS = {
+    "linkedin.com": "LinkedIn",
+    "twitter.com": "Twitter",
+    "facebook.com": "Facebook",
+    "instagram.com": "Instagram",
+    "github.com": "GitHub"
+}
+
+# One alternation over all domains, compiled once at import. A link is assigned
+# to the domain that appears earliest in it (normally the host), not to the first
+# matching entry of SOCIAL_DOMAINS, e.g. a LinkedIn URL carrying a twitter.com
+# share parameter is LinkedIn.
+_SOCIAL_DOMAIN_RE = re.compile("|".join(re.escape(domain) for domain in SOCIAL_DOMAINS))
+
 def search_person(first_name: str, last_name: str) -> Dict:
     """
     Search for information about a person using SerpAPI.
@@ -30,8 +54,18 @@ def search_person(first_name: str, last_name: str) -> Dict:
     
     try:
         # Perform the search
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        response = _SESSION.get(SERPAPI_URL, params=params, timeout=30)
+        
+        # SerpAPI explains 4xx responses (bad key, exhausted quota) in a JSON "error"
+        # field; only a body that is not JSON falls back to the bare HTTP status
+        try:
+            results = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            response.raise_for_status()
+            raise
+        if isinstance(results, dict) and "error" in results:
+            raise ValueError(results["error"])
+        response.raise_for_status()
         
         # Extract relevant information
         search_data = {
@@ -49,8 +83,9 @@ def search_person(first_name: str, last_name: str) -> Dict:
         return search_data
         
     except Exception as e:
-        print(f"Error during search: {str(e)}")
-        return {"error": str(e)}
+        error = _API_KEY_RE.sub(r"\1***", str(e))
+        print(f"Error during search: {error}")
+        return {"error": error}
 
 def save_search_results(first_name: str, last_name: str, data: Dict) -> None:
     """
@@ -67,9 +102,9 @@ def save_search_results(first_name: str, last_name: str, data: Dict) -> None:
     # Create filename
     filename = f"data/{first_name}_{last_name}_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
-    # Save to file
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # Save to file; orjson encodes straight to UTF-8 bytes, skipping the text layer
+    with open(filename, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 def get_social_profiles(results: Dict) -> List[Dict]:
     """
@@ -83,25 +118,16 @@ def get_social_profiles(results: Dict) -> List[Dict]:
     """
     social_profiles = []
     
-    # Common social media domains
-    social_domains = {
-        "linkedin.com": "LinkedIn",
-        "twitter.com": "Twitter",
-        "facebook.com": "Facebook",
-        "instagram.com": "Instagram",
-        "github.com": "GitHub"
-    }
-    
     # Check organic results
     for result in results.get("organic_results", []):
         link = result.get("link", "")
-        for domain, platform in social_domains.items():
-            if domain in link:
-                social_profiles.append({
-                    "platform": platform,
-                    "url": link,
-                    "title": result.get("title", ""),
-                    "snippet": result.get("snippet", "")
-                })
+        match = _SOCIAL_DOMAIN_RE.search(link)
+        if match:
+            social_profiles.append({
+                "platform": SOCIAL_DOMAINS[match.group(0)],
+                "url": link,
+                "title": result.get("title", ""),
+                "snippet": result.get("snippet", "")
+            })
     
     return social_profiles 
\ No newline at end of file
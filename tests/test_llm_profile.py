@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import llm_profile
+from llm_profile import _apply_profile_delta, _extract_json_object
+
+
+def test_extract_json_object_plain():
+    assert _extract_json_object('Sure! {"a": 1} Hope that helps.') == {"a": 1}
+
+
+def test_extract_json_object_skips_braces_in_prose():
+    assert _extract_json_object('Sure {the} answer {"a":1}') == {"a": 1}
+
+
+def test_extract_json_object_skips_quoted_brace_in_prose():
+    text = 'prose "quoted {" then {"a": "esc \\" }"}'
+    assert _extract_json_object(text) == {"a": 'esc " }'}
+
+
+def test_extract_json_object_ignores_braces_in_strings():
+    text = 'Here: {"a": "x}{", "b": {"c": 1}} trailing } text'
+    assert _extract_json_object(text) == {"a": "x}{", "b": {"c": 1}}
+
+
+def test_extract_json_object_none_without_object():
+    assert _extract_json_object("no json here {") is None
+    assert _extract_json_object("[1, 2, 3]") is None
+
+
+def test_extract_json_object_none_for_truncated_reply():
+    text = '{"introduction": "x", "person_meta": {"age": 30}, "communication_st'
+    assert _extract_json_object(text) is None
+
+
+def test_generate_profile_rejects_truncated_reply(monkeypatch):
+    truncated = '{"introduction": "x", "person_meta": {"age": 30}, "communication_st'
+    model = SimpleNamespace(generate_content=lambda *args, **kwargs: SimpleNamespace(text=truncated))
+    monkeypatch.setattr(llm_profile, "_get_model", lambda: model)
+    monkeypatch.setattr(llm_profile, "_GENERATED_PROFILES", llm_profile.OrderedDict())
+
+    profile = llm_profile.generate_profile({"organic_results": [{"title": "T", "snippet": "S"}]})
+
+    assert "error" in profile
+    assert not llm_profile._GENERATED_PROFILES
+
+
+def test_apply_profile_delta_ignores_non_list_fields():
+    profile = {"communication_tips": ["Be brief"]}
+    _apply_profile_delta(profile, {"add_communication_tips": "notalist"})
+    assert profile["communication_tips"] == ["Be brief"]
+
+
+def test_apply_profile_delta_dedupes_stripped_items():
+    profile = {"interests": ["Rust"]}
+    _apply_profile_delta(profile, {"add_interests": ["Rust ", " rust", "Go", "Go "]})
+    assert profile["interests"] == ["Rust", "Go"]
+
+
+def test_prepare_context_tolerates_null_snippet():
+    context = llm_profile.prepare_context({"organic_results": [{"title": "T", "snippet": None, "link": "L"}]})
+    assert "Title: T" in context
+    assert "Link: L" in context
+    assert "Snippet" not in context
+
+
+def test_prepare_context_sends_repeated_snippets_once():
+    results = {
+        "knowledge_graph": {"description": "Builds   compilers."},
+        "organic_results": [
+            {"title": "A", "snippet": "builds compilers.", "link": "a"},
+            {"title": "B", "snippet": "Writes docs.", "link": "b"},
+            {"title": "C", "snippet": "Writes\n docs.", "link": "c"},
+        ],
+    }
+    context = llm_profile.prepare_context(results)
+    assert context.count("Snippet:") == 1
+    assert "Snippet: Writes docs." in context
+    for title, link in (("A", "a"), ("B", "b"), ("C", "c")):
+        assert f"Title: {title}" in context
+        assert f"Link: {link}" in context
+
+
+def test_prepare_context_truncates_long_snippet_at_word_boundary():
+    snippet = "word " * 100
+    context = llm_profile.prepare_context({"organic_results": [{"title": "T", "snippet": snippet, "link": "L"}]})
+    line = next(line for line in context.splitlines() if line.startswith("Snippet: "))
+    text = line[len("Snippet: "):]
+    assert text.endswith("word...")
+    assert len(text) <= llm_profile._SNIPPET_MAX_CHARS + len("...")
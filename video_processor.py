@@ -1,18 +1,21 @@
 import os
-from faster_whisper import WhisperModel
-import tempfile
-from typing import Dict, Optional
-import json
+import copy
+import functools
+import hashlib
+import glob
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, BinaryIO, Dict, Optional, Union
+import orjson
 from datetime import datetime
 import ssl
 import certifi
 import urllib.request
-import google.generativeai as genai
 from dotenv import load_dotenv
-import librosa
-import soundfile as sf
-
 
+if TYPE_CHECKING:
+    import google.generativeai as genai
+    from faster_whisper import WhisperModel
 
 # Load environment variables
 load_dotenv()
@@ -26,33 +29,123 @@ api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
     raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-genai.configure(api_key=api_key)
+# JSON mode: Gemini returns a bare JSON document, with no Markdown fences or prose
+_JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Audio insights keyed by a hash of the transcription they were generated from
+_INSIGHTS_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+_INSIGHTS_CACHE_MAX = 64
+_INSIGHTS_CACHE_LOCK = threading.Lock()
+
+# Whisper models are loaded once per process and shared across calls
+_WHISPER_MODELS: Dict[str, "WhisperModel"] = {}
+_WHISPER_LOCK = threading.Lock()
+
+# Set once the background preload has been started; checked on every rerun, so
+# it must not share _WHISPER_LOCK, which is held for the whole model load
+_WHISPER_PRELOAD_STARTED = threading.Event()
+_WHISPER_PRELOAD_LOCK = threading.Lock()
+
+# CTranslate2 intra-op threads per transcription; its default of 4 leaves larger hosts idle
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", min(16, os.cpu_count() or 4)))
+
+# Model size and CTranslate2 weight type, e.g. WHISPER_MODEL=large-v3 with
+# WHISPER_COMPUTE_TYPE=int8_float16 on hosts with fast fp16
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+def get_whisper_model(model_size: str = WHISPER_MODEL) -> "WhisperModel":
+    """
+    Get a shared Whisper model, loading it on first use.
+    
+    Args:
+        model_size (str): Whisper model size to load
+        
+    Returns:
+        WhisperModel: Loaded Whisper model
+    """
+    # Loaded models are read without the lock, which is only held while loading
+    model = _WHISPER_MODELS.get(model_size)
+    if model is not None:
+        return model
+    
+    with _WHISPER_LOCK:
+        if model_size not in _WHISPER_MODELS:
+            # faster-whisper pulls in CTranslate2 and PyAV; import it with the model
+            from faster_whisper import WhisperModel
+            
+            _WHISPER_MODELS[model_size] = WhisperModel(
+                model_size,
+                device="cpu",
+                compute_type=WHISPER_COMPUTE_TYPE,
+                cpu_threads=WHISPER_CPU_THREADS
+            )
+        return _WHISPER_MODELS[model_size]
 
-def process_audio(audio_file_path: str, person_id: str) -> Dict:
+def preload_whisper_model() -> None:
+    """
+    Start loading the default Whisper model in a background thread.
+    
+    Safe to call on every Streamlit rerun: only the first call starts a thread,
+    and later calls return at once without waiting for the load. A transcription
+    requested while the load is running waits for it on the model lock instead
+    of loading the model a second time.
+    """
+    if _WHISPER_PRELOAD_STARTED.is_set():
+        return
+    with _WHISPER_PRELOAD_LOCK:
+        if _WHISPER_PRELOAD_STARTED.is_set():
+            return
+        _WHISPER_PRELOAD_STARTED.set()
+    
+    def load():
+        try:
+            get_whisper_model()
+        except Exception as e:
+            print(f"Error preloading Whisper model: {str(e)}")
+    
+    threading.Thread(target=load, name="whisper-preload", daemon=True).start()
+
+@functools.lru_cache(maxsize=1)
+def _get_model() -> "genai.GenerativeModel":
+    """
+    Get the Gemini model used for audio analysis, created once and reused.
+    
+    Returns:
+        genai.GenerativeModel: Shared Gemini model
+    """
+    # Audio analysis is the only Gemini use in this module
+    import google.generativeai as genai
+    
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+def process_audio(audio: Union[str, BinaryIO], person_id: str) -> Dict:
     """
     Process audio file and generate transcription.
     
     Args:
-        audio_file_path (str): Path to the audio file
+        audio (Union[str, BinaryIO]): Path to the audio file, or a binary file-like
+            object such as a Streamlit upload
         person_id (str): ID of the person whose audio is being processed
         
     Returns:
         Dict: Dictionary containing transcription and analysis results
     """
     try:
-        # Create a temporary file for the audio
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_path = temp_file.name
-            
-        # Load and process audio
-        y, sr = librosa.load(audio_file_path)
-        sf.write(temp_path, y, sr)
+        # Get the shared Whisper model
+        model = get_whisper_model()
         
-        # Load Whisper model
-        model = WhisperModel("base", device="cpu", compute_type="int8")
-        
-        # Transcribe audio
-        segments, info = model.transcribe(temp_path, language="ru")
+        # Transcribe audio; faster-whisper decodes and resamples the file itself (PyAV).
+        # Greedy decoding and skipping silence (Silero VAD) keep decoder steps down.
+        segments, info = model.transcribe(
+            audio,
+            language="ru",
+            beam_size=1,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=500),
+            condition_on_previous_text=False
+        )
         transcription = " ".join([segment.text for segment in segments])
         
         # Analyze the transcription
@@ -69,11 +162,8 @@ def process_audio(audio_file_path: str, person_id: str) -> Dict:
         output_path = os.path.join("data", "transcriptions", f"{person_id}_transcription.json")
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        with open(output_path, "w") as f:
-            json.dump(output, f, indent=2)
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
         
         return output
         
@@ -83,35 +173,32 @@ def process_audio(audio_file_path: str, person_id: str) -> Dict:
             "error": f"Error processing audio: {str(e)}"
         }
 
-def analyze_audio_content(transcription: str) -> Dict:
+def _analysis_prompt(transcription: str, translate: bool) -> str:
     """
-    Analyze audio content using Gemini to extract insights.
+    Build the prompt that analyzes a transcription, optionally translating it too.
     
     Args:
         transcription (str): The transcribed text from audio
+        translate (bool): Whether to ask for the full English translation as well
         
     Returns:
-        Dict: Structured data containing insights from the audio
+        str: Prompt for the Gemini model
     """
-    try:
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # First, translate the content to English
-        translation_prompt = f"""
-        Translate the following text to English. Keep the original meaning and context intact:
-        
-        {transcription}
-        
-        Provide only the English translation, nothing else.
-        """
-        
-        translation_response = model.generate_content(translation_prompt)
-        english_transcription = translation_response.text.strip()
-        
-        # Now analyze the English translation
-        analysis_prompt = f"""
-        You are a precise JSON generator. Analyze this English text and create a valid JSON object.
+    if translate:
+        task = (
+            "Translate the following text to English, keeping the original meaning and "
+            "context intact, then analyze the English translation and create a valid JSON object."
+        )
+        # Last, so a reply cut short loses the translation before the analysis
+        translation_field = ',\n            "english_transcription": "full English translation"'
+        translation_rule = "\n        7. english_transcription: The complete English translation of the text"
+    else:
+        task = "Analyze the following text and create a valid JSON object, written in English."
+        translation_field = ""
+        translation_rule = ""
+    
+    return f"""
+        You are a precise JSON generator. {task}
         Follow these rules strictly:
         1. Output ONLY valid JSON
         2. Use double quotes for strings
@@ -121,7 +208,7 @@ def analyze_audio_content(transcription: str) -> Dict:
         6. Do not include any comments or explanations
 
         Text to analyze:
-        {english_transcription}
+        {transcription}
         
         Create a JSON object with this exact structure:
         {{
@@ -130,7 +217,7 @@ def analyze_audio_content(transcription: str) -> Dict:
             "key_points": ["point1", "point2"],
             "emotional_tone": "tone description",
             "new_interests": ["interest1", "interest2"],
-            "notable_quotes": ["quote1", "quote2"]
+            "notable_quotes": ["quote1", "quote2"]{translation_field}
         }}
         
         Rules for each field:
@@ -139,34 +226,89 @@ def analyze_audio_content(transcription: str) -> Dict:
         3. key_points: List important information or takeaways
         4. emotional_tone: Describe the overall emotional context
         5. new_interests: List any interests or preferences mentioned
-        6. notable_quotes: List significant statements
+        6. notable_quotes: List significant statements{translation_rule}
         
         Output ONLY the JSON object, nothing else.
         """
+
+def _hit_token_limit(response: "genai.types.GenerateContentResponse") -> bool:
+    """
+    Check whether a Gemini reply was cut off at the output-token limit.
+    
+    Args:
+        response (genai.types.GenerateContentResponse): Gemini response
+        
+    Returns:
+        bool: True if generation stopped because of MAX_TOKENS
+    """
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return False
+    return getattr(candidates[0].finish_reason, "name", None) == "MAX_TOKENS"
+
+def analyze_audio_content(transcription: str) -> Dict:
+    """
+    Analyze audio content using Gemini to extract insights.
+    
+    Args:
+        transcription (str): The transcribed text from audio
         
-        # Generate analysis
-        response = model.generate_content(analysis_prompt)
+    Returns:
+        Dict: Structured data containing insights from the audio
+    """
+    try:
+        # Re-uploads of the same audio give the same transcription; reuse its analysis
+        cache_key = hashlib.blake2b(transcription.encode("utf-8"), digest_size=16).hexdigest()
+        with _INSIGHTS_CACHE_LOCK:
+            if cache_key in _INSIGHTS_CACHE:
+                _INSIGHTS_CACHE.move_to_end(cache_key)
+                return copy.deepcopy(_INSIGHTS_CACHE[cache_key])
+        
+        # Get the shared Gemini model
+        model = _get_model()
         
-        # Clean the response text to ensure it's valid JSON
-        response_text = response.text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        # Translate and analyze in a single request. The translation shares the
+        # reply's output-token cap with the analysis; if a long recording hits the
+        # cap, the analysis is requested again without the translation.
+        translated = True
+        response = model.generate_content(
+            _analysis_prompt(transcription, translate=True),
+            generation_config=_JSON_GENERATION_CONFIG
+        )
+        if _hit_token_limit(response):
+            print("Audio analysis hit the output token limit; retrying without the translation")
+            translated = False
+            response = model.generate_content(
+                _analysis_prompt(transcription, translate=False),
+                generation_config=_JSON_GENERATION_CONFIG
+            )
+        response_text = response.text
         
-        # Parse the response as JSON
+        # Parse the response as JSON; JSON mode guarantees JSON, not an object
         try:
-            insights = json.loads(response_text)
+            insights = orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
+            print(f"JSON parsing error: {str(e)}")
+            insights = None
+        
+        if isinstance(insights, dict):
             # Add transcriptions separately after successful JSON parsing
             insights["language"] = "Russian"
             insights["original_transcription"] = transcription
-            insights["english_transcription"] = english_transcription
+            if translated:
+                insights.setdefault("english_transcription", "Translation failed")
+            else:
+                insights["english_transcription"] = "Translation skipped: recording too long"
+            
+            # Only successful analyses are cached, so failures are retried
+            with _INSIGHTS_CACHE_LOCK:
+                _INSIGHTS_CACHE[cache_key] = copy.deepcopy(insights)
+                if len(_INSIGHTS_CACHE) > _INSIGHTS_CACHE_MAX:
+                    _INSIGHTS_CACHE.popitem(last=False)
             return insights
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
+        else:
             print(f"Raw response: {response_text}")
-            # If JSON parsing fails, try to extract structured information from the text
+            # If the response is not a JSON object, return placeholder insights
             return {
                 "error": "Failed to parse AI response as JSON",
                 "raw_response": response_text,
@@ -178,7 +320,7 @@ def analyze_audio_content(transcription: str) -> Dict:
                 "notable_quotes": [],
                 "language": "Russian",
                 "original_transcription": transcription,
-                "english_transcription": english_transcription
+                "english_transcription": "Translation failed"
             }
             
     except Exception as e:
@@ -218,8 +360,8 @@ def save_transcription(transcription_data: Dict) -> str:
         filepath = os.path.join(transcriptions_dir, filename)
         
         # Save to file
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(transcription_data, f, ensure_ascii=False, indent=2)
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(transcription_data, option=orjson.OPT_INDENT_2))
         
         return filepath
     except Exception as e:
@@ -239,18 +381,15 @@ def get_transcriptions(profile_id: str) -> list:
     transcriptions = []
     transcriptions_dir = os.path.join("data", "transcriptions")
     
-    if not os.path.exists(transcriptions_dir):
-        return transcriptions
-    
-    for filename in os.listdir(transcriptions_dir):
-        if filename.startswith(f"{profile_id}_transcription_"):
-            filepath = os.path.join(transcriptions_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    transcription_data = json.load(f)
-                    transcriptions.append(transcription_data)
-            except Exception as e:
-                print(f"Error reading transcription {filename}: {str(e)}")
+    # Match this profile's files during the directory scan; a missing directory yields nothing
+    pattern = os.path.join(transcriptions_dir, f"{glob.escape(profile_id)}_transcription_*.json")
+    for filepath in glob.iglob(pattern):
+        try:
+            with open(filepath, "rb") as f:
+                transcription_data = orjson.loads(f.read())
+                transcriptions.append(transcription_data)
+        except Exception as e:
+            print(f"Error reading transcription {os.path.basename(filepath)}: {str(e)}")
     
     return transcriptions
 
@@ -267,8 +406,8 @@ def get_transcription(person_id: str) -> Optional[Dict]:
     try:
         file_path = os.path.join("data", "transcriptions", f"{person_id}_transcription.json")
         if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                return json.load(f)
+            with open(file_path, "rb") as f:
+                return orjson.loads(f.read())
         return None
     except Exception as e:
         print(f"Error getting transcription: {str(e)}")